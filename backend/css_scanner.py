@@ -12,39 +12,134 @@ This module analyzes CSS code for security issues:
 
 All detection functions add issues to a shared list with severity and category.
 Thresholds are set to avoid false positives on legitimate sites.
+
+Markers and patterns are counted once per scan by _count_markers; the
+detectors only compare those counts against their thresholds. Results are
+cached by content digest, since the same shared stylesheets show up on many
+pages.
 """
 import re
 
+from scan_cache import ResultCache, content_digest
+from scan_pool import map_in_processes
+
+
+# Literal markers, counted in the raw stylesheet. Each spelling the original
+# detectors looked for is listed; shorter spellings are never substrings of
+# longer ones, so no match is counted twice.
+_MARKERS = {
+    "hidden": (
+        "opacity: 0", "opacity:0",
+        "display: none", "display:none",
+        "visibility: hidden", "visibility:hidden",
+    ),
+    "pointer_events": ("pointer-events: none", "pointer-events:none"),
+    "important": ("!important",),
+}
+
+# Markers whose detectors only need to know whether they appear at all; the
+# search stops at the first hit instead of counting the whole sheet.
+_FLAGS = {
+    "expression": ("expression(",),
+}
+
+# Patterns that allow any whitespace around the colon, matched against the
+# raw sheet. Those that start with a literal are found by re's prefix search.
+_PATTERNS = {
+    "offscreen": re.compile(r"(?:left|right|top|bottom)\s*:\s*-[5-9]\d{3,}px"),
+    # A 9999 prefix also covers 99999 and 999999, as the old alternation did
+    "zindex": re.compile(r"z-index\s*:\s*9999"),
+    "tiny_width": re.compile(r"width\s*:\s*1px"),
+    "tiny_height": re.compile(r"height\s*:\s*1px"),
+}
+
+# Cheap prechecks for patterns without a literal prefix; re has no fast path
+# for a leading alternation, so the full pattern only runs when its gate hits.
+_PATTERN_GATES = {
+    "offscreen": re.compile(r"-[5-9]\d{3}"),
+}
+
+# Byte-string twins of the tables above. CPython stores a non-ASCII str with
+# 2 or 4 bytes per character, so such sheets are scanned as UTF-8 bytes instead
+# (ASCII markers cannot match inside a multi-byte sequence).
+_BYTES_MARKERS = {name: tuple(m.encode() for m in markers) for name, markers in _MARKERS.items()}
+_BYTES_FLAGS = {name: tuple(m.encode() for m in markers) for name, markers in _FLAGS.items()}
+_BYTES_PATTERNS = {name: re.compile(p.pattern.encode()) for name, p in _PATTERNS.items()}
+_BYTES_PATTERN_GATES = {name: re.compile(p.pattern.encode()) for name, p in _PATTERN_GATES.items()}
+
+# Recently scanned stylesheets
+_SCAN_CACHE = ResultCache(maxsize=256)
+
 
 def scan_css(css_code: str) -> list[dict]:
     """
     Main CSS scanner entry point.
+
+    Returns fresh issue dicts on every call, so callers may mutate them
+    without affecting the cache.
     """
+    key = content_digest(css_code)
+    issues = _SCAN_CACHE.get(key)
+    if issues is None:
+        issues = _run_detectors(css_code if css_code.isascii() else css_code.encode("utf-8", "surrogatepass"))
+        _SCAN_CACHE.put(key, issues)
+
+    return [dict(issue) for issue in issues]
+
+
+def scan_many_css(css_codes: list[str]) -> list[list[dict]]:
+    """
+    Scan a batch of stylesheets, one issue list per input in input order.
+
+    Large batches are spread across worker processes.
+    """
+    return map_in_processes(scan_css, css_codes)
+
+
+def _run_detectors(css_code: str | bytes) -> list[dict]:
+    """Run every detector against the stylesheet."""
     issues: list[dict] = []
+    counts = _count_markers(css_code)
 
-    detect_hidden_rules(css_code, issues)
-    detect_offscreen_rules(css_code, issues)
-    detect_zindex_abuse(css_code, issues)
-    detect_pointer_events_tricks(css_code, issues)
-    detect_tiny_click_targets(css_code, issues)
-    detect_expression_usage(css_code, issues)
-    detect_excessive_important(css_code, issues)
+    detect_hidden_rules(counts, issues)
+    detect_offscreen_rules(counts, issues)
+    detect_zindex_abuse(counts, issues)
+    detect_pointer_events_tricks(counts, issues)
+    detect_tiny_click_targets(counts, issues)
+    detect_expression_usage(counts, issues)
+    detect_excessive_important(counts, issues)
 
     return issues
 
 
-def detect_hidden_rules(css: str, issues: list[dict]) -> None:
+def _count_markers(css: str | bytes) -> dict[str, int]:
+    """Count every marker group and pattern in a single place."""
+    if isinstance(css, bytes):
+        marker_table, flag_table = _BYTES_MARKERS, _BYTES_FLAGS
+        pattern_table, gate_table = _BYTES_PATTERNS, _BYTES_PATTERN_GATES
+    else:
+        marker_table, flag_table = _MARKERS, _FLAGS
+        pattern_table, gate_table = _PATTERNS, _PATTERN_GATES
+
+    counts = {
+        name: sum(css.count(m) for m in markers)
+        for name, markers in marker_table.items()
+    }
+    for name, markers in flag_table.items():
+        counts[name] = int(any(m in css for m in markers))
+    for name, pattern in pattern_table.items():
+        gate = gate_table.get(name)
+        if gate is not None and not gate.search(css):
+            counts[name] = 0
+        else:
+            counts[name] = len(pattern.findall(css))
+    return counts
+
+
+def detect_hidden_rules(counts: dict[str, int], issues: list[dict]) -> None:
     # Only flag if there are many hidden rules (suspicious pattern)
     # A few hidden elements are normal for UI (modals, dropdowns, etc.)
-    markers = [
-        "opacity: 0",
-        "opacity:0",
-        "display: none",
-        "display:none",
-        "visibility: hidden",
-        "visibility:hidden",
-    ]
-    count = sum(css.count(m) for m in markers)
+    count = counts["hidden"]
     # Only flag if there are 20+ hidden rules (excessive)
     if count >= 20:
         issues.append({
@@ -54,33 +149,32 @@ def detect_hidden_rules(css: str, issues: list[dict]) -> None:
         })
 
 
-def detect_offscreen_rules(css: str, issues: list[dict]) -> None:
+def detect_offscreen_rules(counts: dict[str, int], issues: list[dict]) -> None:
     # Only flag if positioned way offscreen (screen reader technique uses -9999px legitimately)
     # Only flag if excessive (10+ instances of extreme offscreen positioning)
-    extreme_pattern = r"(left|right|top|bottom)\s*:\s*-[5-9]\d{3,}px"
-    matches = re.findall(extreme_pattern, css)
-    if len(matches) >= 10:
+    count = counts["offscreen"]
+    if count >= 10:
         issues.append({
-            "issue": f"Excessive extreme offscreen positioning detected ({len(matches)} instances)",
+            "issue": f"Excessive extreme offscreen positioning detected ({count} instances)",
             "severity": "low",
             "category": "ui_deception",
         })
 
 
-def detect_zindex_abuse(css: str, issues: list[dict]) -> None:
+def detect_zindex_abuse(counts: dict[str, int], issues: list[dict]) -> None:
     # Only flag if there are many very large z-index values (excessive)
-    matches = re.findall(r"z-index\s*:\s*(9999|99999|999999)", css)
-    if len(matches) >= 10:
+    count = counts["zindex"]
+    if count >= 10:
         issues.append({
-            "issue": f"Excessive large z-index values detected ({len(matches)} instances)",
+            "issue": f"Excessive large z-index values detected ({count} instances)",
             "severity": "low",
             "category": "css_abuse",
         })
 
 
-def detect_pointer_events_tricks(css: str, issues: list[dict]) -> None:
+def detect_pointer_events_tricks(counts: dict[str, int], issues: list[dict]) -> None:
     # Only flag if excessive use (pointer-events: none is legitimate for many UI patterns)
-    count = css.count("pointer-events: none") + css.count("pointer-events:none")
+    count = counts["pointer_events"]
     if count >= 20:
         issues.append({
             "issue": f"Excessive pointer-events manipulation detected ({count} instances)",
@@ -89,11 +183,9 @@ def detect_pointer_events_tricks(css: str, issues: list[dict]) -> None:
         })
 
 
-def detect_tiny_click_targets(css: str, issues: list[dict]) -> None:
+def detect_tiny_click_targets(counts: dict[str, int], issues: list[dict]) -> None:
     # Only flag if there are many tiny targets (1px is sometimes used for screen readers)
-    tiny_width = len(re.findall(r"width\s*:\s*1px", css))
-    tiny_height = len(re.findall(r"height\s*:\s*1px", css))
-    total = tiny_width + tiny_height
+    total = counts["tiny_width"] + counts["tiny_height"]
     
     if total >= 5:
         issues.append({
@@ -103,8 +195,8 @@ def detect_tiny_click_targets(css: str, issues: list[dict]) -> None:
         })
 
 
-def detect_expression_usage(css: str, issues: list[dict]) -> None:
-    if "expression(" in css:
+def detect_expression_usage(counts: dict[str, int], issues: list[dict]) -> None:
+    if counts["expression"]:
         issues.append({
             "issue": "CSS expression() used (old IE scripting in CSS)",
             "severity": "high",
@@ -112,9 +204,9 @@ def detect_expression_usage(css: str, issues: list[dict]) -> None:
         })
 
 
-def detect_excessive_important(css: str, issues: list[dict]) -> None:
+def detect_excessive_important(counts: dict[str, int], issues: list[dict]) -> None:
     # Increase threshold - large sites legitimately use many !important
-    count = css.count("!important")
+    count = counts["important"]
     if count >= 200:
         issues.append({
             "issue": f"Excessive use of !important ({count} times)",
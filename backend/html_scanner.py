@@ -12,57 +12,237 @@ This module analyzes HTML content for security issues:
 - Meta refresh redirects
 - Fake captcha boxes
 
-All detection functions add issues to a shared list with severity and category.
+The page is parsed straight into an lxml tree (the same libxml2 parser
+BeautifulSoup's "lxml" builder drives, without building a second Python-level
+tree on top). Pages nested past libxml2's depth limit are rebuilt with the
+stdlib parser instead, so deep markup cannot hide from the scan. The DOM is
+walked once per scan; detectors receive the element lists they need rather
+than searching the tree themselves. All detection functions add issues to a
+shared list with severity and category.
 """
-from bs4 import BeautifulSoup
+import re
+from collections import defaultdict
+from html.parser import HTMLParser
+from lxml import etree
+from lxml.etree import _Element
 from urllib.parse import urlparse
 
+from scan_pool import map_in_processes
 
-def scan_html(html: str, page_url: str | None = None) -> list[dict]:
+
+# Actual resource loading over HTTP: src="http://", href="http://", url(http://
+# Matched against the lowercased page, which is much cheaper than IGNORECASE
+_MIXED_CONTENT_PATTERNS = tuple(
+    re.compile(pattern)
+    for pattern in (
+        r'src=["\']http://',
+        r'href=["\']http://',
+        r'url\(http://',
+        r'@import\s+["\']?http://',
+    )
+)
+
+# Any markup a DOM detector can fire on: script, iframe, meta, input, anchor,
+# div (captcha boxes), deprecated tags, or an inline style attribute
+_NEEDS_DOM = re.compile(r"<(?:a|center|div|font|iframe|input|marquee|meta|script)\b|style\s*=", re.IGNORECASE)
+
+
+def scan_html(html: str, page_url: str | None = None, root: _Element | None = None) -> list[dict]:
     """
     Main HTML scanner entry point.
+
+    root may be a tree already built from html by parse_html, so callers that
+    parse the page for other reasons do not pay for a second parse.
     """
     issues: list[dict] = []
-    soup = BeautifulSoup(html, "html.parser")
 
-    detect_inline_js(soup, issues)
-    detect_deprecated_tags(soup, issues)
+    # Without any such markup only the raw-text checks can fire, so skip the parse
+    if not _NEEDS_DOM.search(html):
+        detect_insecure_http(page_url, issues)
+        detect_mixed_http(html, page_url, issues)
+        return issues
+
+    if root is None:
+        root = parse_html(html)
+    if root is None:
+        # Empty document (only whitespace or comments)
+        detect_insecure_http(page_url, issues)
+        detect_mixed_http(html, page_url, issues)
+        return issues
+
+    tags_by_name, styled_tags = _index_tags(root)
+    anchors = [a for a in tags_by_name["a"] if "href" in a.attrib]
+    # Tiny-target, overlayed-link and fake play checks all need an inline style
+    # marker on the tag itself, so they only get the styled subset
+    styled_anchors = [a for a in anchors if "style" in a.attrib]
+    play_candidates = [tag for tag in styled_tags if tag.tag in _PLAY_TAGS]
+    style_cache: dict[int, str] = {}
+    text_cache: dict[int, str] = {}
+
+    detect_inline_js(tags_by_name["script"], issues)
+    detect_deprecated_tags(tags_by_name, issues)
     detect_insecure_http(page_url, issues)
     detect_mixed_http(html, page_url, issues)
-    detect_iframe_abuse(soup, issues)
-    detect_hidden_elements(soup, issues)
-    detect_offscreen_elements(soup, issues)
-    detect_tiny_click_targets(soup, issues)
-    detect_hidden_input_fields(soup, issues)
-    detect_clickjacking_overlays(soup, issues)
-    detect_overlayed_links(soup, issues)
-    detect_fake_links_and_text(soup, issues, page_url)
-    detect_fake_play_buttons(soup, issues)
-    detect_meta_refresh_redirects(soup, issues)
-    detect_fake_captcha_boxes(soup, issues)
+    detect_iframe_abuse(tags_by_name["iframe"], issues)
+    hidden, offscreen, overlays = _classify_styled_tags(styled_tags, style_cache)
+    detect_hidden_elements(hidden, issues)
+    detect_offscreen_elements(offscreen, issues)
+    detect_tiny_click_targets(styled_anchors, issues, style_cache)
+    detect_hidden_input_fields(tags_by_name["input"], issues)
+    detect_clickjacking_overlays(overlays, issues)
+    detect_overlayed_links(styled_anchors, issues, style_cache)
+    detect_fake_links_and_text(anchors, issues, page_url)
+    detect_fake_play_buttons(play_candidates, issues, style_cache, text_cache)
+    detect_meta_refresh_redirects(tags_by_name["meta"], issues)
+    if tags_by_name["div"]:
+        page_text = _tag_text(root, text_cache)
+        detect_fake_captcha_boxes(tags_by_name["div"], issues, text_cache, page_text)
 
     return issues
 
 
+def scan_many_html(pages: list[tuple[str, str | None]]) -> list[list[dict]]:
+    """
+    Scan a batch of (html, page_url) pairs, one issue list per page in input order.
+
+    Large batches are spread across worker processes.
+    """
+    htmls = [html for html, _ in pages]
+    page_urls = [page_url for _, page_url in pages]
+    return map_in_processes(scan_html, htmls, page_urls)
+
+
+def parse_html(html: str) -> _Element | None:
+    """
+    Parse a page into an lxml tree, returning the root element.
+
+    The page is handed over as UTF-8 bytes with the encoding fixed, since lxml
+    rejects str input that starts with an XML encoding declaration. Returns
+    None for documents with no elements at all.
+    """
+    # Parsers are cheap to create and not safe to share between threads.
+    # huge_tree lifts libxml2's default nesting limit of 256 to 2048.
+    parser = etree.HTMLParser(encoding="utf-8", huge_tree=True)
+    root = etree.fromstring(html.encode("utf-8", "surrogatepass"), parser)
+    if _depth_exceeded(parser):
+        # libxml2 silently drops everything below its depth limit
+        return _parse_html_deep(html)
+    return root
+
+
+def _depth_exceeded(parser: etree.HTMLParser) -> bool:
+    """Whether the last parse stopped at libxml2's nesting limit."""
+    return any(e.type == etree.ErrorTypes.ERR_RESOURCE_LIMIT for e in parser.error_log)
+
+
+# Elements that never have children, so they are never left open
+_VOID_TAGS = frozenset((
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+))
+
+# Characters lxml refuses in text and attribute values
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+
+
+class _DeepTreeBuilder(HTMLParser):
+    """Builds an lxml tree with the stdlib parser, which has no depth limit."""
+
+    def __init__(self):
+        super().__init__()
+        self.root = etree.Element("html")
+        self._open = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        self._add(tag, attrs, self_closing=False)
+
+    def handle_startendtag(self, tag, attrs):
+        self._add(tag, attrs, self_closing=True)
+
+    def handle_endtag(self, tag):
+        # Close the innermost matching element; stray end tags are ignored
+        for i in range(len(self._open) - 1, 0, -1):
+            if self._open[i].tag == tag:
+                del self._open[i:]
+                break
+
+    def handle_data(self, data):
+        data = _XML_INVALID.sub("", data)
+        parent = self._open[-1]
+        if len(parent):
+            last = parent[-1]
+            last.tail = (last.tail or "") + data
+        else:
+            parent.text = (parent.text or "") + data
+
+    def _add(self, tag, attrs, self_closing):
+        if tag == "html" and len(self._open) == 1:
+            element = self.root
+        else:
+            try:
+                element = etree.SubElement(self._open[-1], tag)
+            except ValueError:
+                # Not a valid element name for lxml
+                return
+        for name, value in attrs:
+            try:
+                element.set(name, _XML_INVALID.sub("", value or ""))
+            except ValueError:
+                pass
+        if not self_closing and tag not in _VOID_TAGS and element is not self.root:
+            self._open.append(element)
+
+
+def _parse_html_deep(html: str) -> _Element:
+    """Parse a page too deeply nested for libxml2, keeping every element."""
+    builder = _DeepTreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def _index_tags(root: _Element) -> tuple[defaultdict[str, list[_Element]], list[_Element]]:
+    """
+    Walk the DOM once, grouping elements by name and collecting inline-styled ones.
+
+    Every list keeps document order; unknown names map to an empty list.
+    Comments and processing instructions are skipped. Holding every element
+    also keeps lxml's proxy objects alive for the scan, so the id()-keyed
+    style and text caches cannot see a recycled id.
+    """
+    tags_by_name: defaultdict[str, list[_Element]] = defaultdict(list)
+    styled_tags: list[_Element] = []
+
+    for tag in root.iter(etree.Element):
+        tags_by_name[tag.tag].append(tag)
+        if "style" in tag.attrib:
+            styled_tags.append(tag)
+
+    return tags_by_name, styled_tags
+
+
 # ------------- Basic HTML security checks -------------
 
 
-def detect_inline_js(soup: BeautifulSoup, issues: list[dict]) -> None:
+# Each check is a C-level substring search, which beats a multi-pattern automaton
+# for this few patterns
+_SUSPICIOUS_INLINE_JS = ("eval(", "Function(", "document.write", "innerHTML", "atob(", "fromCharCode")
+
+
+def detect_inline_js(scripts: list[_Element], issues: list[dict]) -> None:
     # Only flag inline JS if it contains suspicious patterns
-    suspicious_patterns = ["eval(", "Function(", "document.write", "innerHTML", "atob(", "fromCharCode"]
-    
-    for script in soup.find_all("script"):
+    for script in scripts:
         if not script.get("src"):
-            script_content = script.string or ""
-            if any(pattern in script_content for pattern in suspicious_patterns):
+            script_content = script.text or ""
+            if any(pattern in script_content for pattern in _SUSPICIOUS_INLINE_JS):
                 selector = _get_element_selector(script)
                 _add_issue(issues, "Inline JavaScript with suspicious patterns detected", "medium", "malicious_js", selector)
 
 
-def detect_deprecated_tags(soup: BeautifulSoup, issues: list[dict]) -> None:
+def detect_deprecated_tags(tags_by_name: dict[str, list[_Element]], issues: list[dict]) -> None:
     deprecated = ["font", "center", "marquee"]
     for tag_name in deprecated:
-        for tag in soup.find_all(tag_name):
+        for tag in tags_by_name.get(tag_name, ()):
             selector = _get_element_selector(tag)
             _add_issue(issues, f"Deprecated <{tag_name}> tag found", "low", "css_abuse", selector)
 
@@ -75,18 +255,14 @@ def detect_insecure_http(page_url: str | None, issues: list[dict]) -> None:
 
 def detect_mixed_http(html: str, page_url: str | None, issues: list[dict]) -> None:
     # Only flag if actually loading resources over HTTP (not just mentions in comments/text)
-    import re
-    # Look for actual resource loading: src="http://", href="http://", url(http://
-    resource_patterns = [
-        r'src=["\']http://',
-        r'href=["\']http://',
-        r'url\(http://',
-        r'@import\s+["\']?http://'
-    ]
-    
     if not page_url or page_url.startswith("https://"):
-        for pattern in resource_patterns:
-            if re.search(pattern, html, re.IGNORECASE):
+        # Every pattern contains "http://" (case-insensitively); a plain substring
+        # check is far cheaper than the regex scans when it is absent
+        lowered = html.lower()
+        if "http://" not in lowered:
+            return
+        for pattern in _MIXED_CONTENT_PATTERNS:
+            if pattern.search(lowered):
                 issues.append({
                     "issue": "Mixed content: insecure http resources detected",
                     "severity": "medium",
@@ -98,31 +274,81 @@ def detect_mixed_http(html: str, page_url: str | None, issues: list[dict]) -> No
 # ------------- Iframe abuse -------------
 
 
-def detect_iframe_abuse(soup: BeautifulSoup, issues: list[dict]) -> None:
-    iframes = soup.find_all("iframe")
+def detect_iframe_abuse(iframes: list[_Element], issues: list[dict]) -> None:
     count = len(iframes)
     if count == 0:
         return
 
     # For iframes, we'll highlight all of them
-    iframe_selectors = [_get_element_selector(iframe) for iframe in iframes[:5]]  # Limit to first 5
+    selector_str = ",".join(_get_element_selector(iframe) for iframe in iframes[:5])  # Limit to first 5
     if count >= 3:
-        _add_issue(issues, f"{count} iframes detected, possible ad or tracking nesting", "high", "iframe_abuse", ",".join(iframe_selectors))
+        _add_issue(issues, f"{count} iframes detected, possible ad or tracking nesting", "high", "iframe_abuse", selector_str)
     else:
-        _add_issue(issues, f"{count} iframes detected", "medium", "iframe_abuse", ",".join(iframe_selectors))
+        _add_issue(issues, f"{count} iframes detected", "medium", "iframe_abuse", selector_str)
 
 
 # ------------- UI deception and hidden elements -------------
 
 
-def _style_string(tag) -> str:
-    """Normalize style attribute for pattern matching."""
-    return tag.get("style", "").replace(" ", "").lower()
+def _style_string(tag, style_cache: dict[int, str] | None = None) -> str:
+    """
+    Normalize style attribute for pattern matching.
+
+    When a style_cache is given, the normalized string is memoized per tag so
+    later detectors in the same scan reuse it.
+    """
+    if style_cache is None:
+        return _normalize_style(tag.get("style", ""))
+    style = style_cache.get(id(tag))
+    if style is None:
+        style = style_cache[id(tag)] = _normalize_style(tag.get("style", ""))
+    return style
+
+
+def _normalize_style(style: str) -> str:
+    return style.replace(" ", "").lower()
+
+
+# Text nodes of a subtree, leaving out script, style, template and ruby
+# annotation content (which is not visible text)
+_TEXT_NODES = etree.XPath(
+    "descendant-or-self::text()"
+    "[not(ancestor::script or ancestor::style or ancestor::template or ancestor::rt or ancestor::rp)]",
+    smart_strings=False,
+)
+
+
+def _extract_text(tag) -> str:
+    """Stripped text nodes of a tag joined without separators, lowercased."""
+    return "".join(text.strip() for text in _TEXT_NODES(tag)).lower()
+
+
+def _tag_text(tag, text_cache: dict[int, str] | None = None) -> str:
+    """Lowercased text content of a tag, memoized per tag when a text_cache is given."""
+    if text_cache is None:
+        return _extract_text(tag)
+    text = text_cache.get(id(tag))
+    if text is None:
+        text = text_cache[id(tag)] = _extract_text(tag)
+    return text
+
+
+def _class_list(tag) -> list[str]:
+    """Whitespace-separated class names of a tag."""
+    return (tag.get("class") or "").split()
+
+
+def _class_string(tag) -> str:
+    """Lowercased, space-joined class list of a tag."""
+    return " ".join(_class_list(tag)).lower()
+
+
+_CLICKABLE_TAGS = frozenset(("a", "button", "input"))
 
 
 def _is_clickable(tag) -> bool:
     """Check if element is clickable."""
-    return tag.name in ["a", "button", "input"] or tag.get("onclick") or tag.get("href")
+    return tag.tag in _CLICKABLE_TAGS or tag.get("onclick") or tag.get("href")
 
 
 def _add_issue(issues, issue_text, severity, category, element_selector=None):
@@ -136,123 +362,150 @@ def _add_issue(issues, issue_text, severity, category, element_selector=None):
 def _get_element_selector(tag):
     """Generate a CSS selector for an element to enable highlighting."""
     # Build selector from tag name, id, classes
-    selector = tag.name
-    
+    selector = tag.tag
+    tag_id = tag.get("id")
+    classes = _class_list(tag)
+
     # Add ID if present
-    if tag.get("id"):
-        selector += f"#{tag.get('id')}"
-    
+    if tag_id:
+        selector += f"#{tag_id}"
+
     # Add classes if present
-    classes = tag.get("class", [])
     if classes:
-        if isinstance(classes, list):
-            class_str = ".".join(classes)
-        else:
-            class_str = classes
-        selector += f".{class_str.replace(' ', '.')}"
-    
+        selector += "." + ".".join(classes)
+
     # Add nth-of-type if needed for uniqueness
-    if not tag.get("id") and not classes:
-        parent = tag.parent
-        if parent:
-            siblings = [s for s in parent.children if hasattr(s, 'name') and s.name == tag.name]
-            if len(siblings) > 1:
-                index = siblings.index(tag) + 1
+    if not tag_id and not classes:
+        parent = tag.getparent()
+        if parent is not None:
+            # Stop as soon as the tag's position is known and it is not the only one
+            index = None
+            count = 0
+            for sibling in parent.iterchildren(tag.tag):
+                count += 1
+                if sibling is tag:
+                    index = count
+                if index is not None and count > 1:
+                    break
+            if count > 1:
                 selector += f":nth-of-type({index})"
-    
+
     return selector
 
 
-def detect_hidden_elements(soup: BeautifulSoup, issues: list[dict]) -> None:
-    # Only flag if hidden element is clickable or has suspicious attributes
-    hidden_markers = [
-        "opacity:0",
-        "display:none",
-        "visibility:hidden",
-    ]
-
-    for tag in soup.find_all():
-        style = _style_string(tag)
-        if any(marker in style for marker in hidden_markers):
-            if _is_clickable(tag):
-                selector = _get_element_selector(tag)
-                _add_issue(issues, "Hidden clickable element detected (possible UI deception)", "medium", "css_abuse", selector)
-
-
-def detect_offscreen_elements(soup: BeautifulSoup, issues: list[dict]) -> None:
-    # Only flag if element is positioned way offscreen (screen reader technique uses -9999px legitimately)
-    # Only flag if it's a clickable element positioned offscreen
-    offscreen_markers = [
-        "left:-9999px",
-        "right:-9999px",
-        "top:-9999px",
-        "bottom:-9999px",
-    ]
-
-    for tag in soup.find_all():
-        style = _style_string(tag)
-        if any(marker in style for marker in offscreen_markers) and _is_clickable(tag):
-            selector = _get_element_selector(tag)
-            _add_issue(issues, "Offscreen clickable element detected (possible deceptive UI)", "medium", "ui_deception", selector)
+# Hidden/offscreen elements are only flagged when clickable
+# (screen reader technique uses -9999px legitimately)
+_HIDDEN_MARKERS = ("opacity:0", "display:none", "visibility:hidden")
+_OFFSCREEN_MARKERS = ("left:-9999px", "right:-9999px", "top:-9999px", "bottom:-9999px")
+
+
+def _has_hidden_style(style: str) -> bool:
+    return any(marker in style for marker in _HIDDEN_MARKERS)
+
+
+def _has_offscreen_style(style: str) -> bool:
+    return any(marker in style for marker in _OFFSCREEN_MARKERS)
+
+
+def _is_clickjacking_overlay(style: str) -> bool:
+    """
+    Full-page invisible overlay positioned at the page origin.
+
+    Checks short-circuit, so most styles are rejected by the first test.
+    """
+    return (
+        # Full screen size
+        "width:100%" in style and "height:100%" in style
+        # Positioned
+        and ("position:absolute" in style or "position:fixed" in style)
+        # At origin
+        and "top:0" in style and "left:0" in style
+        # Invisible
+        and ("opacity:0" in style or "visibility:hidden" in style)
+    )
+
+
+def _classify_styled_tags(
+    styled_tags: list[_Element], style_cache: dict[int, str] | None = None
+) -> tuple[list[_Element], list[_Element], list[_Element]]:
+    """
+    Sort styled tags into hidden, offscreen and clickjacking candidates in one pass.
+
+    Each tag's style string is normalized once and shared by all three checks.
+    All three need an inline style marker, so only tags with a style attribute
+    are passed in. Each list keeps document order.
+    """
+    hidden, offscreen, overlays = [], [], []
+
+    for tag in styled_tags:
+        style = _style_string(tag, style_cache)
+        if _has_hidden_style(style) and _is_clickable(tag):
+            hidden.append(tag)
+        if _has_offscreen_style(style) and _is_clickable(tag):
+            offscreen.append(tag)
+        if _is_clickjacking_overlay(style):
+            overlays.append(tag)
+
+    return hidden, offscreen, overlays
+
+
+def detect_hidden_elements(hidden: list[_Element], issues: list[dict]) -> None:
+    for tag in hidden:
+        selector = _get_element_selector(tag)
+        _add_issue(issues, "Hidden clickable element detected (possible UI deception)", "medium", "css_abuse", selector)
 
 
-def detect_tiny_click_targets(soup: BeautifulSoup, issues: list[dict]) -> None:
+def detect_offscreen_elements(offscreen: list[_Element], issues: list[dict]) -> None:
+    for tag in offscreen:
+        selector = _get_element_selector(tag)
+        _add_issue(issues, "Offscreen clickable element detected (possible deceptive UI)", "medium", "ui_deception", selector)
+
+
+def detect_clickjacking_overlays(overlays: list[_Element], issues: list[dict]) -> None:
+    for tag in overlays:
+        selector = _get_element_selector(tag)
+        _add_issue(issues, "Full page invisible overlay detected (clickjacking risk)", "high", "clickjacking", selector)
+
+
+def detect_tiny_click_targets(anchors: list[_Element], issues: list[dict], style_cache: dict[int, str] | None = None) -> None:
     # Only check actual links (with href), not anchor points
-    for a in soup.find_all("a", href=True):
-        style = _style_string(a)
+    for a in anchors:
+        style = _style_string(a, style_cache)
         if "width:1px" in style or "height:1px" in style:
             selector = _get_element_selector(a)
             _add_issue(issues, "Tiny click target anchor detected (phishing or tracking)", "medium", "ui_deception", selector)
 
 
-def detect_hidden_input_fields(soup: BeautifulSoup, issues: list[dict]) -> None:
-    for inp in soup.find_all("input"):
+def detect_hidden_input_fields(inputs: list[_Element], issues: list[dict]) -> None:
+    for inp in inputs:
         itype = (inp.get("type") or "").lower()
         if itype == "hidden":
             selector = _get_element_selector(inp)
             _add_issue(issues, "Hidden input field detected", "medium", "tracking", selector)
 
 
-def detect_clickjacking_overlays(soup: BeautifulSoup, issues: list[dict]) -> None:
-    """Detect full-page invisible overlays (clickjacking)."""
-    for tag in soup.find_all():
-        style = _style_string(tag)
-
-        has_full_screen_size = "width:100%" in style and "height:100%" in style
-        is_positioned = "position:absolute" in style or "position:fixed" in style
-        is_at_origin = "top:0" in style and "left:0" in style
-        is_invisible = "opacity:0" in style or "visibility:hidden" in style
-
-        if has_full_screen_size and is_positioned and is_at_origin and is_invisible:
-            selector = _get_element_selector(tag)
-            _add_issue(issues, "Full page invisible overlay detected (clickjacking risk)", "high", "clickjacking", selector)
-
-
-def detect_overlayed_links(soup: BeautifulSoup, issues: list[dict]) -> None:
+def detect_overlayed_links(anchors: list[_Element], issues: list[dict], style_cache: dict[int, str] | None = None) -> None:
     """
     Detect elements positioned over links to intercept clicks.
     
     This checks for suspicious patterns where positioned elements
     might be overlaying clickable links.
     """
-    # Find all links
-    links = soup.find_all("a", href=True)
-    
-    for link in links:
-        link_style = _style_string(link)
+    for link in anchors:
+        link_style = _style_string(link, style_cache)
         
         # Check if link has positioning (might be overlayed)
         if "position:relative" in link_style or "position:absolute" in link_style:
             # Look for siblings or nearby elements that might overlay it
-            parent = link.parent
-            if parent:
-                siblings = [s for s in parent.children if hasattr(s, 'name') and s.name]
+            parent = link.getparent()
+            if parent is not None:
+                siblings = parent.iterchildren(etree.Element)
                 
                 for sibling in siblings:
                     if sibling == link:
                         continue
                     
-                    sibling_style = _style_string(sibling)
+                    sibling_style = _style_string(sibling, style_cache)
                     
                     # Check if sibling is positioned and might overlay the link
                     is_positioned_overlay = (
@@ -262,7 +515,7 @@ def detect_overlayed_links(soup: BeautifulSoup, issues: list[dict]) -> None:
                     
                     # Check if it's clickable (div, span with onclick, etc.)
                     is_clickable_overlay = (
-                        sibling.name in ["div", "span", "button"] and
+                        sibling.tag in ["div", "span", "button"] and
                         (sibling.get("onclick") or sibling.get("href") or _is_clickable(sibling))
                     )
                     
@@ -282,11 +535,19 @@ def detect_overlayed_links(soup: BeautifulSoup, issues: list[dict]) -> None:
 # ------------- Links and fake buttons -------------
 
 
-def detect_fake_links_and_text(soup: BeautifulSoup, issues: list[dict], page_url: str | None = None) -> None:
+# Legitimate TLDs (com, edu, org, net, gov, etc. are all fine)
+_LEGITIMATE_TLDS = frozenset(("com", "edu", "org", "net", "gov", "mil", "io", "co",
+                              "uk", "ca", "au", "de", "fr", "jp", "cn", "in", "br",
+                              "us", "info", "biz", "name", "pro", "tv", "me", "app"))
+
+# Suspicious TLDs often used in streaming, ad networks, or malicious sites
+_SUSPICIOUS_TLDS = frozenset(("xyz", "top", "club", "live", "cc", "tk", "ml", "ga", "cf"))
+
+
+def detect_fake_links_and_text(anchors: list[_Element], issues: list[dict], page_url: str | None = None) -> None:
     # Only check anchors that have an href attribute (actual links, not anchor points)
-    for a in soup.find_all("a", href=True):
+    for a in anchors:
         href = a.get("href", "").strip()
-        text = a.get_text(strip=True)
 
         # Skip legitimate link patterns
         # "#" links scroll to anchors (legitimate - don't flag)
@@ -315,46 +576,50 @@ def detect_fake_links_and_text(soup: BeautifulSoup, issues: list[dict], page_url
             except Exception:
                 continue
 
-            # Legitimate TLDs (com, edu, org, net, gov, etc. are all fine)
-            legitimate_tlds = (".com", ".edu", ".org", ".net", ".gov", ".mil", ".io", ".co", 
-                              ".uk", ".ca", ".au", ".de", ".fr", ".jp", ".cn", ".in", ".br",
-                              ".us", ".info", ".biz", ".name", ".pro", ".tv", ".me", ".app")
-            
             # Only flag if it's NOT a legitimate TLD and matches suspicious patterns
-            is_legitimate = any(domain.endswith(tld) for tld in legitimate_tlds)
-            
-            if not is_legitimate:
-                # Suspicious TLDs often used in streaming, ad networks, or malicious sites
-                suspicious_tlds = (".xyz", ".top", ".club", ".live", ".cc", ".tk", ".ml", ".ga", ".cf")
-                if any(domain.endswith(tld) for tld in suspicious_tlds):
-                    selector = _get_element_selector(a)
-                    _add_issue(issues, f"Link to suspicious TLD domain: {domain}", "high", "redirect", selector)
+            _, dot, tld = domain.rpartition(".")
+            if dot and tld in _SUSPICIOUS_TLDS and tld not in _LEGITIMATE_TLDS:
+                selector = _get_element_selector(a)
+                _add_issue(issues, f"Link to suspicious TLD domain: {domain}", "high", "redirect", selector)
 
 
-def detect_fake_play_buttons(soup: BeautifulSoup, issues: list[dict]) -> None:
-    # Simple heuristics for fake play overlays
-    play_keywords = ("play", "watch", "stream")
+_PLAY_TAGS = frozenset(("a", "button", "div", "span", "img"))
+_PLAY_KEYWORDS = ("play", "watch", "stream")
 
-    for tag in soup.find_all(["a", "button", "div", "span", "img"]):
-        text = tag.get_text(strip=True).lower()
-        classes = " ".join(tag.get("class", [])).lower()
-        alt = (tag.get("alt") or "").lower()
-        style = _style_string(tag)
 
-        combined = " ".join([text, classes, alt])
+def _has_play_keyword(text: str) -> bool:
+    return any(kw in text for kw in _PLAY_KEYWORDS)
 
-        if any(kw in combined for kw in play_keywords):
-            # suspicious if it is absolutely positioned on top
-            if "position:absolute" in style or "position:fixed" in style:
-                selector = _get_element_selector(tag)
-                _add_issue(issues, "Possible fake play button or overlay", "medium", "ui_deception", selector)
+
+def detect_fake_play_buttons(
+    candidates: list[_Element],
+    issues: list[dict],
+    style_cache: dict[int, str] | None = None,
+    text_cache: dict[int, str] | None = None,
+) -> None:
+    # Simple heuristics for fake play overlays
+    for tag in candidates:
+        # suspicious if it is absolutely positioned on top; this is the cheapest
+        # and most selective test, so the keyword checks only run afterwards
+        style = _style_string(tag, style_cache)
+        if "position:absolute" not in style and "position:fixed" not in style:
+            continue
+
+        # Text extraction walks the subtree, so it is checked last
+        if (
+            any(_has_play_keyword(c.lower()) for c in _class_list(tag))
+            or _has_play_keyword((tag.get("alt") or "").lower())
+            or _has_play_keyword(_tag_text(tag, text_cache))
+        ):
+            selector = _get_element_selector(tag)
+            _add_issue(issues, "Possible fake play button or overlay", "medium", "ui_deception", selector)
 
 
 # ------------- Meta refresh and fake captchas -------------
 
 
-def detect_meta_refresh_redirects(soup: BeautifulSoup, issues: list[dict]) -> None:
-    for meta in soup.find_all("meta"):
+def detect_meta_refresh_redirects(metas: list[_Element], issues: list[dict]) -> None:
+    for meta in metas:
         http_equiv = (meta.get("http-equiv") or meta.get("http_equiv") or "").lower()
         content = (meta.get("content") or "").lower()
 
@@ -363,22 +628,31 @@ def detect_meta_refresh_redirects(soup: BeautifulSoup, issues: list[dict]) -> No
             _add_issue(issues, "Meta refresh redirect detected", "high", "redirect", selector)
 
 
-def detect_fake_captcha_boxes(soup: BeautifulSoup, issues: list[dict]) -> None:
+def detect_fake_captcha_boxes(
+    divs: list[_Element],
+    issues: list[dict],
+    text_cache: dict[int, str] | None = None,
+    page_text: str | None = None,
+) -> None:
     # Very heuristic based: boxes that look like captcha but no known provider
     captcha_like = []
 
-    for div in soup.find_all("div"):
-        classes = " ".join(div.get("class", [])).lower()
-        text = div.get_text(strip=True).lower()
+    # Each div's stripped text is a contiguous slice of the page's, so when the
+    # page text has no "captcha" the per-div extraction (quadratic for nested
+    # divs) can be skipped entirely
+    check_text = page_text is None or "captcha" in page_text
 
-        if "captcha" in classes or "captcha" in text:
+    for div in divs:
+        # Class check first; text extraction walks the whole subtree
+        if "captcha" in _class_string(div) or (check_text and "captcha" in _tag_text(div, text_cache)):
             captcha_like.append(div)
 
     for box in captcha_like:
         # Check if page includes real reCAPTCHA or hcaptcha script
-        scripts = [s.get("src", "") for s in box.find_all("script")]
+        # Stop at the first provider script instead of collecting every src
         has_real_captcha = any(
-            "google.com/recaptcha" in src or "hcaptcha.com" in src for src in scripts
+            "google.com/recaptcha" in src or "hcaptcha.com" in src
+            for src in (s.get("src", "") for s in box.iterdescendants("script"))
         )
 
         if not has_real_captcha:
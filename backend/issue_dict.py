@@ -8,13 +8,24 @@ This module coordinates the security scanning process:
 4. Returns results with score, issues list, and issue count
 
 Scoring: Low = -2, Medium = -5, High = -10 points
+
+Results are cached by a digest of the page and its resources, so rescanning
+unchanged content skips the scanners entirely.
 """
 from html_scanner import scan_html
 from js_scanner import scan_js
 from css_scanner import scan_css
+from scan_cache import ResultCache, content_digest
+
+
+# Points deducted per issue; unknown severities cost nothing
+_SEVERITY_COST = {"low": 2, "medium": 5, "high": 10}
 
+# Recent run_scan results, keyed by content digest
+_RESULT_CACHE = ResultCache(maxsize=1024)
 
-def run_scan(html, js_list, css_list, page_url=None):
+
+def run_scan(html, js_list, css_list, page_url=None, root=None):
     """
     Main scan function: parse -> analyze -> store results.
     
@@ -23,23 +34,46 @@ def run_scan(html, js_list, css_list, page_url=None):
         js_list: List of JavaScript code strings
         css_list: List of CSS code strings
         page_url: Optional URL of the page
+        root: Optional lxml tree of html from html_scanner.parse_html
     
     Returns:
         dict with score, issues list, and issue_count
     """
+    # The JS count keeps the split between the two resource lists unambiguous
+    key = content_digest(html, page_url, str(len(js_list)), *js_list, *css_list)
+    result = _RESULT_CACHE.get(key)
+    if result is None:
+        result = _scan_uncached(html, js_list, css_list, page_url, root)
+        _RESULT_CACHE.put(key, result)
+
+    # Fresh issue dicts on every call, so callers cannot corrupt the cache
+    return {
+        "score": result["score"],
+        "issues": [dict(issue) for issue in result["issues"]],
+        "issue_count": result["issue_count"],
+    }
+
+
+def _scan_uncached(html, js_list, css_list, page_url=None, root=None):
+    """Run every scanner over the page and its resources and score the result."""
     issues = []
-    
+
+    # The scans run serially in this process. A worker pool per page costs
+    # more in startup and pickling than the scans take, would fork from a
+    # threaded server, and would throw away the per-script and per-sheet
+    # result caches its workers filled.
+
     # Scan HTML
-    issues.extend(scan_html(html, page_url=page_url))
-    
+    issues.extend(scan_html(html, page_url=page_url, root=root))
+
     # Scan each JavaScript file
     for js_code in js_list:
         issues.extend(scan_js(js_code))
-    
+
     # Scan each CSS file
     for css_code in css_list:
         issues.extend(scan_css(css_code))
-    
+
     # Calculate security score
     score = compute_score(issues)
     
@@ -57,14 +91,11 @@ def compute_score(issues):
     Minimum score is 0.
     """
     score = 100
-    
+
     for issue in issues:
-        severity = issue.get("severity", "low")
-        if severity == "low":
-            score -= 2
-        elif severity == "medium":
-            score -= 5
-        elif severity == "high":
-            score -= 10
-    
-    return max(0, score)
+        score -= _SEVERITY_COST.get(issue.get("severity", "low"), 0)
+        # Scores only go down, so there is no need to look further
+        if score <= 0:
+            return 0
+
+    return score
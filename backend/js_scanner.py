@@ -12,14 +12,47 @@ This module analyzes JavaScript code for security issues:
 - Cookie manipulation
 
 All detection functions add issues to a shared list with severity and category.
+Keyword lists live at module level; each is matched with plain substring
+checks, which run as C fast searches and stop at the first hit. Results are
+cached by content digest, since CDN-hosted libraries show up on many pages.
 """
 import re
+import string
+
+from scan_cache import ResultCache, content_digest
+from scan_pool import map_in_processes
+
+# Recently scanned scripts
+_SCAN_CACHE = ResultCache(maxsize=512)
 
 
 def scan_js(js_code: str) -> list[dict]:
     """
     Main JS scanner entry point.
+
+    Returns fresh issue dicts on every call, so callers may mutate them
+    without affecting the cache.
+    """
+    key = content_digest(js_code)
+    issues = _SCAN_CACHE.get(key)
+    if issues is None:
+        issues = _run_detectors(js_code)
+        _SCAN_CACHE.put(key, issues)
+
+    return [dict(issue) for issue in issues]
+
+
+def scan_many_js(js_codes: list[str]) -> list[list[dict]]:
     """
+    Scan a batch of scripts, one issue list per input in input order.
+
+    Large batches are spread across worker processes.
+    """
+    return map_in_processes(scan_js, js_codes)
+
+
+def _run_detectors(js_code: str) -> list[dict]:
+    """Run every detector against the script."""
     issues: list[dict] = []
 
     detect_eval_and_function(js_code, issues)
@@ -46,8 +79,8 @@ def detect_eval_and_function(js: str, issues: list[dict]) -> None:
             "category": "malicious_js",
         })
 
-    # Dynamic Function constructor
-    if "Function(" in js or "new Function(" in js:
+    # Dynamic Function constructor ("new Function(" contains "Function(")
+    if "Function(" in js:
         issues.append({
             "issue": "Use of Function constructor in JavaScript",
             "severity": "high",
@@ -64,9 +97,11 @@ def detect_document_write(js: str, issues: list[dict]) -> None:
         })
 
 
+_DOM_INJECTION_PATTERNS = ("innerHTML", "outerHTML", "insertAdjacentHTML")
+
+
 def detect_dom_injection_patterns(js: str, issues: list[dict]) -> None:
-    patterns = ["innerHTML", "outerHTML", "insertAdjacentHTML"]
-    if any(p in js for p in patterns):
+    if any(p in js for p in _DOM_INJECTION_PATTERNS):
         issues.append({
             "issue": "Direct DOM HTML injection patterns detected",
             "severity": "medium",
@@ -77,23 +112,26 @@ def detect_dom_injection_patterns(js: str, issues: list[dict]) -> None:
 # ------------- Redirects, popups, click hijacking -------------
 
 
+_REDIRECT_KEYWORDS = (
+    "window.location",
+    "location.href",
+    "location.assign",
+    "location.replace",
+    "window.open(",
+)
+
+_CLICK_BINDINGS = (
+    "document.onclick",
+    "document.onmousedown",
+    "document.addEventListener('click'",
+    'document.addEventListener("click"',
+)
+
+
 def detect_redirect_handlers(js: str, issues: list[dict]) -> None:
-    redirect_keywords = [
-        "window.location",
-        "location.href",
-        "location.assign",
-        "location.replace",
-        "window.open(",
-    ]
-
-    click_bindings = [
-        "document.onclick",
-        "document.onmousedown",
-        "document.addEventListener('click'",
-        'document.addEventListener("click"',
-    ]
-
-    if any(cb in js for cb in click_bindings) and any(rk in js for rk in redirect_keywords):
+    # Redirect keywords (which share "window.open(" with the popup check) are
+    # only searched once a document-level click binding has been found
+    if any(cb in js for cb in _CLICK_BINDINGS) and any(rk in js for rk in _REDIRECT_KEYWORDS):
         issues.append({
             "issue": "Click handler that triggers redirect or new window",
             "severity": "high",
@@ -101,14 +139,15 @@ def detect_redirect_handlers(js: str, issues: list[dict]) -> None:
         })
 
 
-def detect_popup_spam(js: str, issues: list[dict]) -> None:
-    popup_patterns = [
-        "window.open(",
-        "openNewWindow(",
-        "window.showModalDialog",
-    ]
+_POPUP_PATTERNS = (
+    "window.open(",
+    "openNewWindow(",
+    "window.showModalDialog",
+)
+
 
-    if any(p in js for p in popup_patterns):
+def detect_popup_spam(js: str, issues: list[dict]) -> None:
+    if any(p in js for p in _POPUP_PATTERNS):
         issues.append({
             "issue": "Popup or new window behavior detected",
             "severity": "medium",
@@ -119,20 +158,21 @@ def detect_popup_spam(js: str, issues: list[dict]) -> None:
 # ------------- Crypto mining and obfuscation -------------
 
 
+_MINING_TERMS = (
+    "coinhive",
+    "miner",
+    "hashrate",
+    "webmine",
+)
+
+_WASM_PATTERNS = (
+    "WebAssembly.instantiate",
+    "WebAssembly.compile",
+)
+
+
 def detect_crypto_mining(js: str, issues: list[dict]) -> None:
-    suspicious_terms = [
-        "coinhive",
-        "miner",
-        "hashrate",
-        "webmine",
-    ]
-
-    wasm_patterns = [
-        "WebAssembly.instantiate",
-        "WebAssembly.compile",
-    ]
-
-    if any(term in js for term in suspicious_terms) or any(wp in js for wp in wasm_patterns):
+    if any(term in js for term in _MINING_TERMS) or any(wp in js for wp in _WASM_PATTERNS):
         issues.append({
             "issue": "Possible crypto mining script detected",
             "severity": "high",
@@ -140,21 +180,43 @@ def detect_crypto_mining(js: str, issues: list[dict]) -> None:
         })
 
 
+# Only flag actual obfuscation, not minification or normal encoding
+# Very long hex strings (50+ bytes) - likely obfuscation. The first escape is
+# spelled out so re can use its literal-prefix search instead of trying the
+# repeated group at every position.
+_LONG_HEX_RE = re.compile(r"\\x[0-9a-fA-F]{2}(?:\\x[0-9a-fA-F]{2}){49,}")
+# Very long base64 strings (100+ chars) - likely obfuscation. Rather than a
+# [A-Za-z0-9+/]{100,} regex, which re retries from every character of a
+# shorter run (up to about 100 steps per position), base64 bytes are mapped
+# to 1 and everything else to 0, and the result is searched for a run of 100
+# ones. Both are linear; the C translate and find are just a faster constant.
+# Non-ASCII characters encode to bytes >= 0x80, which never count.
+_BASE64_TABLE = bytes(
+    1 if chr(b) in string.ascii_letters + string.digits + "+/" else 0
+    for b in range(256)
+)
+_BASE64_RUN = b"\x01" * 100
+# Common obfuscation patterns
+_OBFUSCATION_PATTERNS = (
+    re.compile(r"eval\s*\(\s*atob\s*\("),
+    re.compile(r"Function\s*\(\s*['\"][a-zA-Z0-9+/]{50,}"),
+    re.compile(r"String\.fromCharCode\s*\([^)]{100,}\)"),
+)
+
+
+def _has_long_base64(js: str) -> bool:
+    """Linear-time check for a run of 100+ base64 alphabet characters."""
+    return _BASE64_RUN in js.encode("utf-8", "surrogatepass").translate(_BASE64_TABLE)
+
+
 def detect_obfuscation(js: str, issues: list[dict]) -> None:
-    # Only flag actual obfuscation, not minification or normal encoding
-    # Look for very long hex strings (50+ bytes) - likely obfuscation
-    long_hex = re.search(r"(?:\\x[0-9a-fA-F]{2}){50,}", js)
-    # Very long base64 strings (100+ chars) - likely obfuscation
-    long_base64 = re.search(r"[A-Za-z0-9+/]{100,}={0,2}", js)
-    # Look for common obfuscation patterns
-    obfuscation_patterns = [
-        r"eval\s*\(\s*atob\s*\(",
-        r"Function\s*\(\s*['\"][a-zA-Z0-9+/]{50,}",
-        r"String\.fromCharCode\s*\([^)]{100,}\)",
-    ]
-
-    has_obfuscation = long_hex or long_base64 or any(re.search(p, js) for p in obfuscation_patterns)
-    
+    # Checks stop at the first hit
+    has_obfuscation = (
+        _LONG_HEX_RE.search(js)
+        or _has_long_base64(js)
+        or any(p.search(js) for p in _OBFUSCATION_PATTERNS)
+    )
+
     if has_obfuscation:
         issues.append({
             "issue": "Obfuscated or encoded JavaScript detected",
@@ -166,15 +228,16 @@ def detect_obfuscation(js: str, issues: list[dict]) -> None:
 # ------------- Autoplay and media injection -------------
 
 
+_MEDIA_PATTERNS = (
+    "new Audio(",
+    ".play()",
+    "HTMLAudioElement",
+    "HTMLVideoElement",
+)
+
+
 def detect_autoplay_injection(js: str, issues: list[dict]) -> None:
-    media_patterns = [
-        "new Audio(",
-        ".play()",
-        "HTMLAudioElement",
-        "HTMLVideoElement",
-    ]
-
-    if "play()" in js and any(m in js for m in media_patterns):
+    if "play()" in js and any(m in js for m in _MEDIA_PATTERNS):
         issues.append({
             "issue": "Possible auto play of media without user interaction",
             "severity": "medium",
@@ -0,0 +1,54 @@
+"""
+Bounded LRU cache for scan results.
+
+The same pages, scripts and stylesheets are scanned over and over, so scanners
+keep recent results keyed by a digest of their input. Entries are shared
+between threads; callers copy values out before handing them to anyone who
+might mutate them.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """Thread-safe LRU mapping from content digests to scan results."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[bytes, object] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes):
+        """Return the cached value for key (marking it recently used), or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: bytes, value) -> None:
+        """Store value under key, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+def content_digest(*parts: str | None) -> bytes:
+    """
+    16-byte blake2b digest of a sequence of strings.
+
+    Each part is length-prefixed and None is kept distinct from "", so
+    different splits of the same text never share a digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if part is None:
+            digest.update(b"N")
+            continue
+        data = part.encode("utf-8", "surrogatepass")
+        digest.update(b"S%d:" % len(data))
+        digest.update(data)
+    return digest.digest()
@@ -0,0 +1,34 @@
+"""
+Process pool helper for batch scanning.
+
+The scanners are CPU-bound pure Python, so batches of pages or stylesheets are
+spread across processes rather than threads. Patterns are compiled at import
+time, so forked workers inherit them ready to use.
+
+Each call starts and stops its own pool, which suits offline batch jobs. The
+API does not use it: run_scan scans a page in-process, where the scanners'
+result caches stay warm.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Below this many inputs, pool startup costs more than it saves
+MIN_PARALLEL_BATCH = 8
+
+
+def map_in_processes(fn, *iterables) -> list:
+    """
+    Apply fn across the inputs in worker processes, preserving input order.
+
+    Small batches (and single-core hosts) run serially in the calling process.
+    """
+    args = [list(it) for it in iterables]
+    count = len(args[0]) if args else 0
+    workers = min(count, os.cpu_count() or 1)
+
+    if count < MIN_PARALLEL_BATCH or workers <= 1:
+        return [fn(*call_args) for call_args in zip(*args)]
+
+    chunksize = max(1, min(16, count // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(fn, *args, chunksize=chunksize))
@@ -7,117 +7,536 @@ This module handles:
 3. Parsing CSS rules and inline styles
 4. Returning structured data for security scanning
 
-All functions are synchronous and return simple data structures.
+HTML is parsed with html_scanner.parse_html, the same parser the HTML scan
+uses, and only the resource tags are visited.
+
+All functions are synchronous and return simple data structures. Batches of
+subresources are fetched concurrently on a thread pool, since the work is
+network-bound.
 """
+import os
+import re
+import sys
+import threading
+import time
 import requests
-from bs4 import BeautifulSoup
-import cssutils
-import logging
-from urllib.parse import urljoin
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet
+from urllib3.util.retry import Retry
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+# html_scanner lives in backend/, as in scan_api
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), 'backend')
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from html_scanner import parse_html
+
+# Only these tags carry CSS/JS resources
+_RESOURCE_TAGS = ("style", "script", "link")
+
+# Upper bound on simultaneous subresource downloads for one page
+_MAX_FETCH_WORKERS = 16
+
+# js_sources keeps this many characters of each external script; a UTF-8
+# character is at most 4 bytes, so this many bytes always covers them
+_JS_SOURCE_CHARS = 5000
+_JS_SOURCE_BYTES = 4 * _JS_SOURCE_CHARS
+
+# Caps up to this size are prefixes the caller wants, so only that much is
+# requested with a Range header; larger caps are safety limits
+_RANGE_MAX_BYTES = _JS_SOURCE_BYTES
+
+# Hard limit on any response body; larger pages are refused rather than read
+_MAX_RESPONSE_BYTES = 10 * 1024 * 1024
+
+# Content types that can never be scanned as HTML, CSS or JS
+_NON_TEXT_TYPES = ("image/", "video/", "audio/", "font/", "application/pdf")
+
+# Realistic browser headers, sent with every request to avoid blocking
+_BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+# Transient gateway errors, rate limits and failed connects are retried
+# briefly. Read errors are not: the server may already have acted on the
+# request, and a hung read has used its budget. Retry-After is ignored, since
+# urllib3 would sleep for as long as any server asks. The last response is
+# returned rather than raised, so raise_for_status still reports its status.
+_RETRY = Retry(
+    total=2,
+    connect=2,
+    read=0,
+    backoff_factor=0.2,
+    status_forcelist=(429, 502, 503, 504),
+    allowed_methods=frozenset(["GET", "HEAD"]),
+    respect_retry_after_header=False,
+    raise_on_status=False,
+)
+
+# (connect, read) seconds. An unreachable host fails fast, while a server that
+# accepted the connection still gets time to produce the body.
+_TIMEOUT = (3.0, 12.0)
+
+# Shared session so same-host assets reuse keep-alive connections instead of
+# opening a new TCP/TLS connection per request. The pool is sized well above
+# _MAX_FETCH_WORKERS so concurrent fetches never block waiting for a socket.
+_SESSION = requests.Session()
+_SESSION.headers.update(_BROWSER_HEADERS)
+_ADAPTER = HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=_RETRY)
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+# Stylesheet tokens: comments, strings (unterminated ones run to the end),
+# escapes, the structural characters, and plain runs of everything else
+_CSS_TOKENS = re.compile(
+    r"/\*.*?(?:\*/|\Z)"
+    r"|\"(?:\\.|[^\"\\])*\"?"
+    r"|'(?:\\.|[^'\\])*'?"
+    r"|\\.?"
+    r"|[{}();]"
+    r"|[^{}();\"'\\/]+|/",
+    re.DOTALL,
+)
+
+# Whitespace runs outside quoted strings
+_CSS_WHITESPACE = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')|\s+")
 
-logging.getLogger("cssutils").setLevel(logging.CRITICAL)
+# Selector spacing: quoted strings, attribute selectors and pseudo-class
+# arguments are kept as-is; commas and combinators get canonical spacing
+_SELECTOR_SPACING = re.compile(
+    r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'|\[[^\]]*\]|\([^)]*\))|\s*([,>+~])\s*|\s+"
+)
 
+_IMPORTANT = re.compile(r"!\s*important$", re.IGNORECASE)
 
-def fetch_resources(url):
+# Cache-Control directives that forbid reusing a response
+_NO_REUSE_DIRECTIVES = ("no-store", "no-cache", "private")
+
+
+class _FetchCache:
+    """
+    Thread-safe LRU of recent successful fetches, each kept for ttl seconds.
+
+    Bounded by entry count and by total characters, so a run of large bundles
+    cannot pin unbounded memory.
+    """
+
+    def __init__(self, maxsize, ttl, max_chars):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_chars = max_chars
+        self._entries = OrderedDict()   # key -> (expires_at, (content, status_code))
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached (content, status_code) for key, or None if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, result):
+        """Store a (content, status_code) result, evicting the oldest entries as needed."""
+        if len(result[0]) > self.max_chars:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._chars += len(result[0])
+            while len(self._entries) > self.maxsize or self._chars > self.max_chars:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _, result = self._entries.pop(key)
+        self._chars -= len(result[0])
+
+
+# Shared CDN scripts and stylesheets repeat across pages and scans
+_FETCH_CACHE = _FetchCache(maxsize=512, ttl=300, max_chars=64 * 1024 * 1024)
+
+# Fetches currently running, so concurrent requests for a URL share one download
+_IN_FLIGHT = {}
+_IN_FLIGHT_LOCK = threading.Lock()
+
+
+def fetch_resources(url, max_bytes=None):
     """
     Fetch HTML, CSS, or JS content from a URL.
     
     Uses realistic browser headers to avoid blocking.
     Returns (content, status_code) tuple. content is None on failure.
+
+    With max_bytes set, only the first max_bytes bytes are downloaded and
+    decoded. Small caps are also sent as a Range header.
+
+    Successful responses are reused for a few minutes unless the server marks
+    them no-store, no-cache or private, and concurrent calls for the same URL
+    share a single download.
     """
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Connection": "keep-alive",
-        "Upgrade-Insecure-Requests": "1",
-    }
-    
+    key = (url, max_bytes)
+    cached = _FETCH_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    with _IN_FLIGHT_LOCK:
+        future = _IN_FLIGHT.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = _IN_FLIGHT[key] = Future()
+    if not is_owner:
+        return future.result()
+
     try:
-        response = requests.get(url, timeout=15, headers=headers, allow_redirects=True)
-        response.raise_for_status()
-        return (response.text, response.status_code)
+        content, status_code, reusable = _download(url, max_bytes)
+        result = (content, status_code)
+        if content is not None and reusable:
+            _FETCH_CACHE.put(key, result)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _IN_FLIGHT_LOCK:
+            del _IN_FLIGHT[key]
+
+    future.set_result(result)
+    return result
+
+
+def _download(url, max_bytes):
+    """
+    Perform the request for fetch_resources.
+
+    Returns (content, status_code, reusable), where reusable says whether the
+    response's Cache-Control allows keeping it.
+    """
+    # For a small prefix, servers that support ranges stop after the cap
+    # themselves; otherwise the stream is simply closed once enough has been
+    # read. A range counts encoded bytes, so the body is asked for uncompressed.
+    headers = None
+    if max_bytes is not None and max_bytes <= _RANGE_MAX_BYTES:
+        headers = {"Range": f"bytes=0-{max(max_bytes, 1) - 1}", "Accept-Encoding": "identity"}
+
+    try:
+        with _SESSION.get(url, timeout=_TIMEOUT, allow_redirects=True, stream=True, headers=headers) as response:
+            if headers is not None and response.status_code == 416:
+                # No range of an empty file can be satisfied
+                return ("", response.status_code, False)
+            response.raise_for_status()
+
+            content_type = response.headers.get("Content-Type", "").lower()
+            if content_type.startswith(_NON_TEXT_TYPES):
+                print(f"[ERROR] Non-text content ({content_type}) at URL ({url})")
+                return (None, None, False)
+
+            if max_bytes is not None:
+                data = _read_body(response, min(max_bytes, _MAX_RESPONSE_BYTES), truncate=True)
+                # Sniffing the charset would need the whole body, so fall back
+                # to UTF-8 when the server does not declare one
+                return (_decode_body(response, data, sniff=False), response.status_code, _is_reusable(response))
+
+            # Refuse oversized bodies up front when the server says how big they
+            # are, and while streaming when it does not (or when it compresses)
+            declared = response.headers.get("Content-Length", "")
+            data = None
+            if not (declared.isdigit() and int(declared) > _MAX_RESPONSE_BYTES):
+                data = _read_body(response, _MAX_RESPONSE_BYTES, truncate=False)
+            if data is None:
+                print(f"[ERROR] Response larger than {_MAX_RESPONSE_BYTES} bytes at URL ({url})")
+                return (None, None, False)
+            return (_decode_body(response, data, sniff=True), response.status_code, _is_reusable(response))
     except requests.exceptions.HTTPError as e:
-        status_code = e.response.status_code if e.response else None
+        # A Response is falsy for error statuses, so test against None
+        status_code = e.response.status_code if e.response is not None else None
         print(f"[ERROR] HTTP {status_code} error fetching URL ({url}): {e}")
-        return (None, status_code)
+        return (None, status_code, False)
     except requests.exceptions.Timeout:
         print(f"[ERROR] Timeout fetching URL ({url})")
-        return (None, None)
+        return (None, None, False)
     except requests.exceptions.ConnectionError:
         print(f"[ERROR] Connection error fetching URL ({url})")
-        return (None, None)
+        return (None, None, False)
     except Exception as e:
         print(f"[ERROR] Error fetching URL ({url}): {e}")
-        return (None, None)
+        return (None, None, False)
+
 
+def _is_reusable(response):
+    """Whether the response's Cache-Control allows serving it again."""
+    cache_control = response.headers.get("Cache-Control", "").lower()
+    return not any(directive in cache_control for directive in _NO_REUSE_DIRECTIVES)
 
-def parse_external_resources(html, base_url):
+
+def _read_body(response, limit, truncate):
     """
-    Extract CSS and JS resources from HTML.
-    
+    Read up to limit bytes of a streamed (and already decompressed) body.
+
+    A longer body is cut at limit when truncate is set; otherwise None is
+    returned and the rest is never downloaded.
+    """
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(chunk_size=min(65536, max(1, limit))):
+        size += len(chunk)
+        if size > limit:
+            if not truncate:
+                return None
+            chunks.append(chunk[:len(chunk) - (size - limit)])
+            break
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _decode_body(response, data, sniff):
+    """Decode a body the way response.text does, optionally without charset sniffing."""
+    encoding = response.encoding
+    if encoding is None and sniff:
+        encoding = chardet.detect(data)["encoding"]
+    try:
+        return str(data, encoding or "utf-8", errors="replace")
+    except (LookupError, TypeError):
+        return str(data, errors="replace")
+
+
+def fetch_many(urls, max_bytes=None):
+    """
+    Fetch several URLs concurrently with fetch_resources.
+
+    max_bytes is applied to every URL, or may be a list with one cap per URL.
+    Returns a list of (content, status_code) tuples in input order.
+
+    Pages often reference the same asset more than once, so each distinct
+    URL (after _normalize_url) is only fetched once per batch.
+    """
+    urls = list(urls)
+    caps = max_bytes if isinstance(max_bytes, list) else [max_bytes] * len(urls)
+    keys = [(_normalize_url(url), cap) for url, cap in zip(urls, caps)]
+    unique = list(dict.fromkeys(keys))
+
+    if len(unique) <= 1:
+        results = [fetch_resources(url, cap) for url, cap in unique]
+    else:
+        with ThreadPoolExecutor(max_workers=min(_MAX_FETCH_WORKERS, len(unique))) as executor:
+            results = list(executor.map(fetch_resources, *zip(*unique)))
+
+    by_key = dict(zip(unique, results))
+    return [by_key[key] for key in keys]
+
+
+def _normalize_url(url):
+    """
+    Canonical form of a URL for deduplicating fetches.
+
+    Scheme and host are case-insensitive and the fragment is never sent, so
+    those are normalized away. Netlocs with credentials are left alone.
+    """
+    parts = urlsplit(url)
+    netloc = parts.netloc if "@" in parts.netloc else parts.netloc.lower()
+    return urlunsplit((parts.scheme.lower(), netloc, parts.path, parts.query, ""))
+
+
+def extract_resources(html, base_url, root=None):
+    """
+    Find the CSS and JS resources in HTML without fetching anything.
+
+    root may be an lxml tree already parsed from html, to skip parsing it again.
+
     Returns dict with:
     - internal_styles: List of <style> block contents
     - internal_scripts: List of inline <script> contents
     - external_css_files: List of CSS file URLs
     - external_js_files: List of JS file URLs
-    - css_rules: Parsed CSS rules (not used by scanner, kept for compatibility)
-    - js_sources: External JS file contents (not used by scanner, kept for compatibility)
     """
-    soup = BeautifulSoup(html, "lxml")
     internal_styles = []
     internal_scripts = []
     external_css_files = []
     external_js_files = []
 
-    for el in soup.find_all():
-        tag = el.name
-        attrs = el.attrs
+    if root is None:
+        root = parse_html(html)
+    elements = root.iter(_RESOURCE_TAGS) if root is not None else ()
 
-        if tag == "style" and el.string:
-            internal_styles.append(el.string)
-        elif tag == "script":
-            if attrs.get("src"):
-                external_js_files.append(urljoin(base_url, attrs["src"]))
-            elif el.string:
-                internal_scripts.append(el.string)
-        elif tag == "link" and attrs.get("rel") == ["stylesheet"]:
-            external_css_files.append(urljoin(base_url, attrs["href"]))
-
-    # Fetch external CSS files
-    css_rules = []
-    for css_url in external_css_files:
-        css_text, _ = fetch_resources(css_url)
-        if css_text:
-            css_rules.extend(parse_css_rules(css_text))
+    for el in elements:
+        tag = el.tag
+        attrs = el.attrib
 
-    # Fetch external JS files
-    js_sources = []
-    for js_url in external_js_files:
-        js_text, _ = fetch_resources(js_url)
-        if js_text:
-            js_sources.append({"url": js_url, "content": js_text[:5000]})
+        if tag == "style" and el.text:
+            internal_styles.append(el.text)
+        elif tag == "script":
+            src = attrs.get("src")
+            if src:
+                external_js_files.append(urljoin(base_url, src))
+            elif el.text:
+                internal_scripts.append(el.text)
+        elif tag == "link" and (attrs.get("rel") or "").split() == ["stylesheet"]:
+            href = attrs.get("href")
+            if href is not None:
+                external_css_files.append(urljoin(base_url, href))
 
     return {
         "internal_styles": internal_styles,
         "internal_scripts": internal_scripts,
         "external_css_files": external_css_files,
         "external_js_files": external_js_files,
-        "css_rules": css_rules,
-        "js_sources": js_sources
     }
 
 
+def parse_external_resources(html, base_url, root=None):
+    """
+    Extract CSS and JS resources from HTML and fetch the external ones.
+
+    root may be an lxml tree already parsed from html, to skip parsing it again.
+    
+    Returns the extract_resources dict plus:
+    - css_rules: Parsed CSS rules (not used by scanner, kept for compatibility)
+    - js_sources: External JS file contents (not used by scanner, kept for compatibility)
+    """
+    resources = extract_resources(html, base_url, root=root)
+    external_css_files = resources["external_css_files"]
+    external_js_files = resources["external_js_files"]
+
+    # Fetch external CSS and JS files in one concurrent batch. Only a prefix
+    # of each script is kept, so only that much is downloaded.
+    caps = [None] * len(external_css_files) + [_JS_SOURCE_BYTES] * len(external_js_files)
+    fetched = fetch_many(external_css_files + external_js_files, caps)
+    css_fetched = fetched[:len(external_css_files)]
+    js_fetched = fetched[len(external_css_files):]
+
+    css_rules = []
+    for css_text, _ in css_fetched:
+        if css_text:
+            css_rules.extend(parse_css_rules(css_text))
+
+    js_sources = []
+    for js_url, (js_text, _) in zip(external_js_files, js_fetched):
+        if js_text:
+            js_sources.append({"url": js_url, "content": js_text[:_JS_SOURCE_CHARS]})
+
+    resources["css_rules"] = css_rules
+    resources["js_sources"] = js_sources
+    return resources
+
+
 def parse_css_rules(css_text):
-    """Parse CSS stylesheet into structured rules. Used for compatibility."""
+    """
+    Parse CSS stylesheet into structured rules. Used for compatibility.
+
+    Only top-level style rules are returned; at-rules (and anything nested in
+    them) are skipped. Selectors and values keep their source text with
+    whitespace normalized.
+    """
     rules = []
-    try:
-        sheet = cssutils.parseString(css_text)
-        for rule in sheet:
-            if rule.type == rule.STYLE_RULE:
-                properties = {decl.name: decl.value for decl in rule.style}
-                rules.append({"selectors": rule.selectorText, "properties": properties})
-    except Exception:
-        pass
+    prelude = []        # tokens of the current top-level prelude
+    declaration = []    # tokens of the current declaration in a style rule
+    declarations = []
+    selector = ""
+    in_style_rule = False
+    depth = 0           # brace depth
+    parens = 0          # paren depth within the current declaration
+
+    for match in _CSS_TOKENS.finditer(css_text):
+        token = match.group()
+        if token.startswith("/*"):
+            continue
+
+        if depth == 0:
+            if token == "{":
+                depth = 1
+                selector = _normalize_selector("".join(prelude))
+                in_style_rule = bool(selector) and not selector.startswith("@")
+                prelude = []
+            elif token == ";" or token == "}":
+                # End of an at-rule statement such as @import, or a stray brace
+                prelude = []
+            else:
+                prelude.append(token)
+            continue
+
+        if token == "{":
+            # Nested block; whatever led up to it is not a declaration
+            depth += 1
+            declaration = []
+        elif token == "}":
+            depth -= 1
+            if depth == 0:
+                if in_style_rule:
+                    declarations.append("".join(declaration))
+                    rules.append({"selectors": selector, "properties": _parse_declarations(declarations)})
+                declaration, declarations, parens = [], [], 0
+        elif depth == 1 and in_style_rule:
+            # Semicolons inside parens belong to the value, e.g. data: URLs
+            if token == ";" and not parens:
+                declarations.append("".join(declaration))
+                declaration = []
+            else:
+                if token == "(":
+                    parens += 1
+                elif token == ")" and parens:
+                    parens -= 1
+                declaration.append(token)
+
+    # A rule left open at the end of the sheet still counts
+    if depth and in_style_rule:
+        declarations.append("".join(declaration))
+        rules.append({"selectors": selector, "properties": _parse_declarations(declarations)})
+
     return rules
+
+
+def _normalize_selector(text):
+    """Collapse whitespace and space commas/combinators the way cssutils did."""
+    def replace(match):
+        if match.group(1):
+            return match.group(1)
+        sep = match.group(2)
+        if sep == ",":
+            return ", "
+        return f" {sep} " if sep else " "
+
+    return _SELECTOR_SPACING.sub(replace, text).strip()
+
+
+def _parse_declarations(declarations):
+    """
+    Build a property dict from raw "name: value" declaration strings.
+
+    Later declarations win unless an earlier one for the same property was
+    marked !important; the priority itself is not part of the value.
+    """
+    properties = {}
+    important = set()
+
+    for text in declarations:
+        name, colon, value = text.partition(":")
+        name = name.strip()
+        if not name.startswith("--"):
+            name = name.lower()
+        value = _CSS_WHITESPACE.sub(lambda m: m.group(1) or " ", value).strip()
+
+        priority = _IMPORTANT.search(value)
+        if priority:
+            value = value[:priority.start()].rstrip()
+
+        if not (colon and name and value):
+            continue
+        if name in important and not priority:
+            continue
+        properties[name] = value
+        if priority:
+            important.add(name)
+
+    return properties
@@ -3,12 +3,16 @@ FastAPI server for web security scanning.
 
 This API provides endpoints for scanning websites:
 - POST /scan: Accepts URL or HTML/CSS/JS content, runs security scanners, returns results
+- POST /scan_batch: Accepts a list of URLs, scans them concurrently, returns results in order
 - GET /health: Health check endpoint
 
 The server fetches web pages, extracts CSS/JS resources, and runs security analysis.
 Returns JSON with security score, issues list, and issue count.
 """
+import asyncio
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import sys
@@ -21,11 +25,19 @@ if BACKEND_DIR not in sys.path:
     sys.path.insert(0, BACKEND_DIR)
 sys.path.insert(0, BASE_DIR)
 
+from html_scanner import parse_html
 from issue_dict import run_scan
-from parser_utils import fetch_resources, parse_external_resources
+from parser_utils import extract_resources, fetch_many, fetch_resources
 
 app = FastAPI(title="WebShield Scan API")
 
+# Scripts and stylesheets beyond this size are only scanned up to the cap
+_MAX_SUBRESOURCE_BYTES = 2 * 1024 * 1024
+
+# Pages /scan_batch scans at once, and the most it accepts per request
+_BATCH_CONCURRENCY = 10
+_MAX_BATCH_URLS = 50
+
 # CORS for browser extension
 app.add_middleware(
     CORSMiddleware,
@@ -48,6 +60,12 @@ def handle_http_error(status_code, url):
     raise HTTPException(status_code=status_code, detail=message)
 
 
+def _parse_page(html, url):
+    """Parse a fetched page and list its resources (nothing is fetched)."""
+    root = parse_html(html)
+    return root, extract_resources(html, url, root=root)
+
+
 @app.post("/scan")
 async def scan(request: Request):
     """
@@ -57,10 +75,54 @@ async def scan(request: Request):
     Returns: { "score": int, "issues": [...], "issue_count": int }
     """
     payload = await request.json()
+    result = await _scan_payload(payload)
+    # The result is plain str/int data, so it is serialized as-is rather
+    # than walked by jsonable_encoder first
+    return JSONResponse(result)
+
+
+@app.post("/scan_batch")
+async def scan_batch(request: Request):
+    """
+    Scan several websites concurrently.
+    
+    Accepts: { "urls": ["...", ...] }
+    Returns: { "results": [...] } in input order. Each entry is a /scan result,
+    or { "url": "...", "error": "...", "status_code": int } if that URL failed.
+    """
+    payload = await request.json()
+    urls = (payload.get('urls') or []) if isinstance(payload, dict) else None
+    if not isinstance(urls, list):
+        raise HTTPException(status_code=400, detail="'urls' must be a list of URLs")
+    if len(urls) > _MAX_BATCH_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {_MAX_BATCH_URLS} URLs can be scanned per batch")
+
+    # Pages share the fetch session, caches and in-flight downloads, so assets
+    # common to several pages are only fetched once
+    semaphore = asyncio.Semaphore(_BATCH_CONCURRENCY)
+
+    async def scan_one(url):
+        if not isinstance(url, str) or not url:
+            return {"url": url, "error": "Each URL must be a non-empty string", "status_code": 400}
+        async with semaphore:
+            try:
+                return await _scan_payload({"url": url})
+            except HTTPException as e:
+                return {"url": url, "error": e.detail, "status_code": e.status_code}
+
+    results = await asyncio.gather(*(scan_one(url) for url in urls))
+    return JSONResponse({"results": results})
+
+
+async def _scan_payload(payload):
+    """Run a /scan request; returns the result dict or raises HTTPException."""
     url = payload.get('url')
     html = payload.get('html')
+    if url is not None and not isinstance(url, str):
+        raise HTTPException(status_code=400, detail="'url' must be a string")
     js_list = payload.get('js', []) or []
     css_list = payload.get('css', []) or []
+    root = None
 
     # Fetch HTML if URL provided
     if url and not html:
@@ -72,8 +134,9 @@ async def scan(request: Request):
             )
         
         try:
-            # Fetch HTML
-            html, status_code = fetch_resources(url)
+            # Fetching and parsing block, so they run in the threadpool
+            # rather than on the event loop
+            html, status_code = await run_in_threadpool(fetch_resources, url)
             if not html:
                 if status_code:
                     handle_http_error(status_code, url)
@@ -83,8 +146,8 @@ async def scan(request: Request):
                         detail=f"Failed to fetch URL: {url}. The server could not download the page. It may be unreachable or blocked."
                     )
             
-            # Extract and fetch external CSS/JS files
-            resources = parse_external_resources(html, url)
+            # Parse once; the same tree serves resource extraction and the HTML scan
+            root, resources = await run_in_threadpool(_parse_page, html, url)
             
             # Add internal styles/scripts
             if not css_list:
@@ -92,15 +155,16 @@ async def scan(request: Request):
             if not js_list:
                 js_list = resources.get("internal_scripts", [])
             
-            # Fetch external CSS files
-            for css_url in resources.get("external_css_files", []):
-                css_content, _ = fetch_resources(css_url)
+            # Fetch external CSS and JS files concurrently
+            css_urls = resources.get("external_css_files", [])
+            js_urls = resources.get("external_js_files", [])
+            fetched = await run_in_threadpool(fetch_many, css_urls + js_urls, max_bytes=_MAX_SUBRESOURCE_BYTES)
+
+            for css_content, _ in fetched[:len(css_urls)]:
                 if css_content:
                     css_list.append(css_content)
-            
-            # Fetch external JS files
-            for js_url in resources.get("external_js_files", []):
-                js_content, _ = fetch_resources(js_url)
+
+            for js_content, _ in fetched[len(css_urls):]:
                 if js_content:
                     js_list.append(js_content)
                     
@@ -113,10 +177,10 @@ async def scan(request: Request):
     if not html:
         raise HTTPException(status_code=400, detail="No HTML provided and no URL fetch succeeded")
 
-    # Run security scan
+    # Run security scan. It is CPU-bound, so it runs in the threadpool to keep
+    # the event loop free for other requests
     try:
-        result = run_scan(html, js_list, css_list, page_url=url)
-        return result
+        return await run_in_threadpool(run_scan, html, js_list, css_list, page_url=url, root=root)
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,9 @@
+"""Put the repo root and backend/ on the import path, as scan_api.py does."""
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(BASE_DIR, "backend")
+for path in (BACKEND_DIR, BASE_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,28 @@
+from css_scanner import scan_css
+
+EXPRESSION_ISSUE = "CSS expression() used (old IE scripting in CSS)"
+
+
+def _issues(css):
+    return [issue["issue"] for issue in scan_css(css)]
+
+
+def test_expression_is_flagged():
+    assert EXPRESSION_ISSUE in _issues("a { width: expression(document.body.clientWidth) }")
+
+
+def test_spaced_out_expression_is_not_flagged():
+    assert EXPRESSION_ISSUE not in _issues("/* express ion( */ a { content: 'express ion(' }")
+
+
+def test_spaced_important_is_not_counted():
+    assert _issues("a { color: red ! important }" * 250) == []
+    assert _issues("a { color: red !important }" * 250) == ["Excessive use of !important (250 times)"]
+
+
+def test_whitespace_around_colon_matches_like_before():
+    # "z-index" and the 1px checks allow any whitespace; the literal markers
+    # accept only the spellings the detectors always listed
+    assert _issues("a { z-index :\t99999 }" * 10) == ["Excessive large z-index values detected (10 instances)"]
+    assert _issues("a { width:\n1px }" * 5) == ["Multiple tiny clickable areas detected (5 instances)"]
+    assert _issues("a { opacity :0 }" * 20) == []
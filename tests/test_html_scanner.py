@@ -0,0 +1,42 @@
+import pytest
+
+from html_scanner import parse_html, scan_html
+
+
+def _nested(depth, inner):
+    return "<html><body>" + "<span>" * depth + inner + "</span>" * depth + "</body></html>"
+
+
+@pytest.mark.parametrize("depth", [10, 260, 300, 2000, 3000])
+def test_deeply_nested_markup_is_scanned(depth):
+    html = _nested(depth, '<a href="">x</a><script>eval(1)</script>')
+    issues = [issue["issue"] for issue in scan_html(html)]
+
+    assert "Inline JavaScript with suspicious patterns detected" in issues
+    assert "Link with empty href and no interaction handler" in issues
+
+
+def test_deep_fallback_keeps_every_element():
+    html = _nested(3000, '<p>a<br>b<input type="hidden" name="t"></p>') + "<iframe></iframe>"
+    root = parse_html(html)
+
+    assert len(root.findall(".//span")) == 3000
+    assert root.find(".//input").get("type") == "hidden"
+    assert root.find(".//iframe") is not None
+
+
+def test_styled_element_issues_keep_detector_order():
+    # The overlay comes first in the page but is reported after the tiny
+    # target and hidden input, as the detectors run in that order
+    html = (
+        '<html><body>'
+        '<div style="position:fixed; top:0; left:0; width:100%; height:100%; opacity:0"></div>'
+        '<input type="hidden" name="t">'
+        '<a href="/tiny" style="width:1px">x</a>'
+        '<button style="left:-9999px">off</button>'
+        '<button style="display:none">hidden</button>'
+        '</body></html>'
+    )
+    categories = [issue["category"] for issue in scan_html(html, page_url="https://example.com")]
+
+    assert categories == ["css_abuse", "ui_deception", "ui_deception", "tracking", "clickjacking"]
@@ -0,0 +1,54 @@
+import pytest
+
+import issue_dict
+from scan_cache import ResultCache
+
+HTML = "<html><body><script>eval(1)</script></body></html>"
+SCRIPT = "document.cookie = 'a=1'"
+SHEET = "a { width: expression(1) }"
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    """Start from an empty result cache and record every uncached scan."""
+    calls = []
+    scan_uncached = issue_dict._scan_uncached
+
+    def recording_scan(*args):
+        calls.append(args)
+        return scan_uncached(*args)
+
+    monkeypatch.setattr(issue_dict, "_RESULT_CACHE", ResultCache(maxsize=16))
+    monkeypatch.setattr(issue_dict, "_scan_uncached", recording_scan)
+    return calls
+
+
+def test_cache_hits_return_fresh_issue_dicts(scans):
+    first = issue_dict.run_scan(HTML, [SCRIPT], [SHEET], page_url="https://a.test/")
+    first["issues"][0]["severity"] = "tampered"
+    first["issues"].clear()
+
+    second = issue_dict.run_scan(HTML, [SCRIPT], [SHEET], page_url="https://a.test/")
+
+    assert len(scans) == 1
+    assert second["issue_count"] == len(second["issues"]) > 0
+    assert all(issue["severity"] != "tampered" for issue in second["issues"])
+
+
+def test_page_url_is_part_of_the_key(scans):
+    issue_dict.run_scan(HTML, [SCRIPT], [SHEET], page_url="https://a.test/")
+    issue_dict.run_scan(HTML, [SCRIPT], [SHEET], page_url="http://a.test/")
+
+    assert len(scans) == 2
+
+
+@pytest.mark.parametrize("js_list, css_list", [
+    ([SCRIPT, SHEET], []),
+    ([], [SCRIPT, SHEET]),
+    ([SHEET], [SCRIPT]),
+])
+def test_moving_a_resource_between_lists_misses(scans, js_list, css_list):
+    issue_dict.run_scan(HTML, [SCRIPT], [SHEET])
+    issue_dict.run_scan(HTML, js_list, css_list)
+
+    assert len(scans) == 2
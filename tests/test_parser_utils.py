@@ -0,0 +1,308 @@
+import pytest
+import requests
+
+import parser_utils
+from parser_utils import extract_resources, fetch_resources
+
+
+class FakeResponse:
+    """Just enough of requests.Response for parser_utils._download."""
+
+    def __init__(self, body=b"", status_code=200, headers=None, encoding="utf-8"):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers if headers is not None else {"Content-Type": "text/css"}
+        self.encoding = encoding
+        self.bytes_read = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error", response=self)
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.body), chunk_size):
+            chunk = self.body[start:start + chunk_size]
+            self.bytes_read += len(chunk)
+            yield chunk
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """
+    Replace the HTTP session and start with empty fetch caches.
+
+    Set session.responses[url] to a FakeResponse (or a callable returning
+    one); session.calls records (url, headers) for every request.
+    """
+    class FakeSession:
+        def __init__(self):
+            self.responses = {}
+            self.calls = []
+
+        def get(self, url, headers=None, **kwargs):
+            self.calls.append((url, headers))
+            response = self.responses.get(url)
+            if response is None:
+                return FakeResponse(status_code=404)
+            return response() if callable(response) else response
+
+    fake = FakeSession()
+    monkeypatch.setattr(parser_utils, "_SESSION", fake)
+    monkeypatch.setattr(parser_utils, "_FETCH_CACHE", parser_utils._FetchCache(maxsize=8, ttl=300, max_chars=1000))
+    return fake
+
+
+@pytest.mark.parametrize("depth", [10, 300, 3000])
+def test_deeply_nested_resources_are_extracted(depth):
+    html = (
+        '<html><head><link rel="stylesheet" href="a.css"></head><body>'
+        + "<span>" * depth
+        + '<script src="b.js"></script><script>eval(1)</script><style>p{}</style>'
+        + "</span>" * depth
+        + "</body></html>"
+    )
+    resources = extract_resources(html, "http://example.com/")
+
+    assert resources == {
+        "internal_styles": ["p{}"],
+        "internal_scripts": ["eval(1)"],
+        "external_css_files": ["http://example.com/a.css"],
+        "external_js_files": ["http://example.com/b.js"],
+    }
+
+
+def test_small_cap_requests_an_uncompressed_range(session):
+    session.responses["http://a.test/x.js"] = FakeResponse(b"x" * 100, status_code=206)
+
+    assert fetch_resources("http://a.test/x.js", max_bytes=10) == ("x" * 10, 206)
+    (_, headers), = session.calls
+    assert headers == {"Range": "bytes=0-9", "Accept-Encoding": "identity"}
+
+
+def test_safety_cap_is_not_sent_as_a_range(session):
+    session.responses["http://a.test/x.js"] = FakeResponse(b"x" * 100)
+
+    assert fetch_resources("http://a.test/x.js", max_bytes=2 * 1024 * 1024) == ("x" * 100, 200)
+    (_, headers), = session.calls
+    assert headers is None
+
+
+def test_unsatisfiable_range_is_an_empty_body(session):
+    # An empty file has no byte 0, so a ranged request for it gets a 416
+    session.responses["http://a.test/empty.js"] = FakeResponse(status_code=416)
+
+    assert fetch_resources("http://a.test/empty.js", max_bytes=10) == ("", 416)
+
+
+def test_retries_do_not_sleep_for_retry_after(monkeypatch):
+    from urllib3.response import HTTPResponse
+    from urllib3.util import retry
+
+    slept = []
+    monkeypatch.setattr(retry.time, "sleep", slept.append)
+    response = HTTPResponse(body=b"", status=503, headers={"Retry-After": "86400"}, preload_content=False)
+
+    retry_state = parser_utils._RETRY.increment("GET", "/", response=response)
+    retry_state.sleep(response)
+
+    # The first retry has no backoff, and the header is not honored
+    assert slept == []
+
+
+def test_fetch_cache_serves_repeats_until_ttl(session, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(parser_utils.time, "monotonic", lambda: now[0])
+    session.responses["http://a.test/a.css"] = lambda: FakeResponse(b"a{}")
+
+    assert fetch_resources("http://a.test/a.css") == ("a{}", 200)
+    assert fetch_resources("http://a.test/a.css") == ("a{}", 200)
+    assert len(session.calls) == 1
+
+    now[0] += 301
+    assert fetch_resources("http://a.test/a.css") == ("a{}", 200)
+    assert len(session.calls) == 2
+
+
+def test_fetch_cache_budgets():
+    cache = parser_utils._FetchCache(maxsize=2, ttl=300, max_chars=10)
+
+    cache.put("a", ("aaaa", 200))
+    cache.put("b", ("bbbb", 200))
+    cache.get("a")
+    cache.put("c", ("cc", 200))
+    # Over the entry count: the least recently used entry goes
+    assert cache.get("b") is None
+    assert cache.get("a") == ("aaaa", 200)
+
+    cache.put("d", ("ddddddd", 200))
+    # Over the character budget: the oldest entries go until it fits
+    assert cache.get("a") is None and cache.get("c") is None
+    assert cache.get("d") == ("ddddddd", 200)
+
+    # Larger than the whole budget: never stored
+    cache.put("e", ("e" * 11, 200))
+    assert cache.get("e") is None
+
+
+@pytest.mark.parametrize("cache_control", ["no-store", "no-cache", "private, max-age=60", "No-Store"])
+def test_uncacheable_responses_are_refetched(session, cache_control):
+    headers = {"Content-Type": "text/css", "Cache-Control": cache_control}
+    session.responses["http://a.test/a.css"] = lambda: FakeResponse(b"a{}", headers=headers)
+
+    fetch_resources("http://a.test/a.css")
+    fetch_resources("http://a.test/a.css")
+    assert len(session.calls) == 2
+
+
+def test_failures_are_not_cached(session):
+    session.responses["http://a.test/flaky.css"] = lambda: FakeResponse(status_code=503)
+
+    assert fetch_resources("http://a.test/flaky.css") == (None, 503)
+    session.responses["http://a.test/flaky.css"] = lambda: FakeResponse(b"a{}")
+    assert fetch_resources("http://a.test/flaky.css") == ("a{}", 200)
+
+
+def test_concurrent_callers_share_one_download(session):
+    import threading
+
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_response():
+        started.set()
+        release.wait(5)
+        return FakeResponse(b"a{}")
+
+    session.responses["http://a.test/a.css"] = slow_response
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fetch_resources("http://a.test/a.css"))) for _ in range(2)]
+
+    threads[0].start()
+    assert started.wait(5)
+    threads[1].start()
+    # The second caller waits on the in-flight download instead of starting its own
+    threads[1].join(0.2)
+    assert threads[1].is_alive()
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [("a{}", 200), ("a{}", 200)]
+    assert len(session.calls) == 1
+    assert parser_utils._IN_FLIGHT == {}
+
+
+@pytest.mark.parametrize("content_type", ["image/png", "video/mp4", "font/woff2", "application/pdf", "Image/GIF"])
+def test_non_text_responses_are_refused(session, content_type):
+    response = FakeResponse(b"\x89PNG", headers={"Content-Type": content_type})
+    session.responses["http://a.test/file"] = response
+
+    assert fetch_resources("http://a.test/file") == (None, None)
+    assert response.bytes_read == 0
+
+
+def test_declared_oversized_responses_are_refused_unread(session, monkeypatch):
+    monkeypatch.setattr(parser_utils, "_MAX_RESPONSE_BYTES", 100)
+    response = FakeResponse(b"x" * 1000, headers={"Content-Type": "text/html", "Content-Length": "1000"})
+    session.responses["http://a.test/big.html"] = response
+
+    assert fetch_resources("http://a.test/big.html") == (None, None)
+    assert response.bytes_read == 0
+
+
+def test_undeclared_oversized_responses_stop_streaming(session, monkeypatch):
+    monkeypatch.setattr(parser_utils, "_MAX_RESPONSE_BYTES", 100)
+    response = FakeResponse(b"x" * 1000, headers={"Content-Type": "text/html"})
+    session.responses["http://a.test/big.html"] = response
+
+    assert fetch_resources("http://a.test/big.html") == (None, None)
+    assert response.bytes_read <= 200
+
+    session.responses["http://a.test/fits.html"] = FakeResponse(b"x" * 100, headers={"Content-Type": "text/html"})
+    assert fetch_resources("http://a.test/fits.html") == ("x" * 100, 200)
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTP://Example.COM/Path?Q=1#frag", "http://example.com/Path?Q=1"),
+    ("https://example.com/a.css", "https://example.com/a.css"),
+    ("https://User:Pw@Example.com/a.css", "https://User:Pw@Example.com/a.css"),
+])
+def test_normalize_url(url, expected):
+    assert parser_utils._normalize_url(url) == expected
+
+
+def test_fetch_many_dedupes_and_keeps_input_order(session):
+    session.responses["http://a.test/a.css"] = lambda: FakeResponse(b"a{}")
+    session.responses["http://a.test/b.js"] = lambda: FakeResponse(b"b()", headers={"Content-Type": "text/javascript"})
+    urls = ["http://a.test/b.js", "HTTP://A.test/a.css#top", "http://a.test/missing.js", "http://a.test/a.css", "http://a.test/b.js"]
+
+    results = parser_utils.fetch_many(urls)
+
+    assert results == [("b()", 200), ("a{}", 200), (None, 404), ("a{}", 200), ("b()", 200)]
+    assert sorted(url for url, _ in session.calls) == [
+        "http://a.test/a.css", "http://a.test/b.js", "http://a.test/missing.js",
+    ]
+
+
+def test_fetch_many_keeps_different_caps_apart(session):
+    session.responses["http://a.test/b.js"] = lambda: FakeResponse(b"b" * 50, headers={"Content-Type": "text/javascript"})
+
+    results = parser_utils.fetch_many(["http://a.test/b.js", "http://a.test/b.js"], [None, 10])
+
+    assert results == [("b" * 50, 200), ("b" * 10, 200)]
+    assert len(session.calls) == 2
+
+
+@pytest.mark.parametrize("css, expected", [
+    # Comments are dropped, wherever they are
+    ("/* a { color: red } */ b { /* c: d */ color: blue; /* } */ }",
+     [{"selectors": "b", "properties": {"color": "blue"}}]),
+    # Braces and semicolons inside strings are part of the value
+    ("a { content: \"}{;\" ; font-family: 'x; y' }",
+     [{"selectors": "a", "properties": {"content": '"}{;"', "font-family": "'x; y'"}}]),
+    # Escaped braces and quotes do not open blocks or strings
+    (r'.a\{b { color: red } .c\:hover { color: \"x }',
+     [{"selectors": r".a\{b", "properties": {"color": "red"}},
+      {"selectors": r".c\:hover", "properties": {"color": r"\"x"}}]),
+    # At-rules and everything nested in them are skipped
+    ("@media screen { a { color: red } @supports (x:y) { b { c: d } } } e { f: g }",
+     [{"selectors": "e", "properties": {"f": "g"}}]),
+    ("@import url(x.css); a{b:c}",
+     [{"selectors": "a", "properties": {"b": "c"}}]),
+    # Semicolons inside parens belong to the value
+    ("a { background: url(data:image/png;base64,AA;B) }",
+     [{"selectors": "a", "properties": {"background": "url(data:image/png;base64,AA;B)"}}]),
+    # A block or comment left open at the end of the sheet
+    ("a { color: red; margin: 0",
+     [{"selectors": "a", "properties": {"color": "red", "margin": "0"}}]),
+    ("a { color: red } /* b { c: d }",
+     [{"selectors": "a", "properties": {"color": "red"}}]),
+    # Empty rules are kept; empty or nameless declarations are not
+    ("a { } b { ; color: ; : x }",
+     [{"selectors": "a", "properties": {}}, {"selectors": "b", "properties": {}}]),
+])
+def test_parse_css_rules(css, expected):
+    assert parser_utils.parse_css_rules(css) == expected
+
+
+def test_parse_css_rules_normalizes_selectors():
+    css = "a>b ,  c   d+e~f , [x = 'a  b'] , g:not( .h  .i ) { color: red }"
+    (rule,) = parser_utils.parse_css_rules(css)
+
+    # Attribute selectors and pseudo-class arguments keep their own spacing
+    assert rule["selectors"] == "a > b, c d + e ~ f, [x = 'a  b'], g:not( .h  .i )"
+
+
+def test_parse_css_rules_priority_and_property_names():
+    css = "a { color: red !important; color: blue; Margin : 0 ! IMPORTANT ; --X: 1 }"
+    (rule,) = parser_utils.parse_css_rules(css)
+
+    # !important wins over later declarations and is dropped from the value;
+    # names are lowercased except custom properties
+    assert rule["properties"] == {"color": "red", "margin": "0", "--X": "1"}
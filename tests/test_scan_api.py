@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import scan_api
+
+PAGE = "<html><body><script>eval(1)</script></body></html>"
+
+
+def _post(endpoint, payload):
+    """Call an endpoint coroutine with a JSON body and decode its response."""
+    body = json.dumps(payload).encode()
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    request = Request({"type": "http", "method": "POST", "headers": []}, receive)
+    response = asyncio.run(endpoint(request))
+    return json.loads(response.body)
+
+
+@pytest.fixture(autouse=True)
+def fake_fetch(monkeypatch):
+    """Serve PAGE for every URL ending in /ok and a 404 for anything else."""
+    def fetch(url, max_bytes=None):
+        return (PAGE, 200) if url.endswith("/ok") else (None, 404)
+
+    monkeypatch.setattr(scan_api, "fetch_resources", fetch)
+    monkeypatch.setattr(scan_api, "fetch_many", lambda urls, max_bytes=None: [(None, None)] * len(urls))
+
+
+def test_batch_mixes_valid_and_invalid_entries_in_order():
+    urls = ["http://a.test/ok", 5, "", None, "http://a.test/missing", ["x"], "http://b.test/ok"]
+    results = _post(scan_api.scan_batch, {"urls": urls})["results"]
+
+    assert len(results) == len(urls)
+    assert results[0]["issue_count"] == results[6]["issue_count"] > 0
+    for index in (1, 2, 3, 5):
+        assert results[index] == {
+            "url": urls[index],
+            "error": "Each URL must be a non-empty string",
+            "status_code": 400,
+        }
+    assert results[4]["status_code"] == 404
+
+
+@pytest.mark.parametrize("payload", [{"urls": "http://a.test/ok"}, ["http://a.test/ok"]])
+def test_batch_rejects_non_list_urls(payload):
+    with pytest.raises(HTTPException) as excinfo:
+        _post(scan_api.scan_batch, payload)
+    assert excinfo.value.status_code == 400
+
+
+def test_batch_rejects_oversized_batches():
+    urls = ["http://a.test/ok"] * (scan_api._MAX_BATCH_URLS + 1)
+    with pytest.raises(HTTPException) as excinfo:
+        _post(scan_api.scan_batch, {"urls": urls})
+    assert excinfo.value.status_code == 400
+
+
+def test_scan_rejects_non_string_url():
+    with pytest.raises(HTTPException) as excinfo:
+        _post(scan_api.scan, {"url": 5})
+    assert excinfo.value.status_code == 400